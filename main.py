@@ -1,75 +1,141 @@
 import argparse
-import datetime
 from math import trunc
 import os
+import numpy as np
 import pandas as pd
-import calendar
+import csv
 import re
 
+# compiled once at import; parse_month_cols applies these across every column
+_MONTH_SEP_RE = re.compile(r'[ /]')
+_COMPACT_MONTH_RE = re.compile(r'^([A-Za-z]{3,9})(\d{2,4})$')
+_FULL_DATE_RE = re.compile(r'\d{1,2}[-/\s]?(?:\d{1,2}|[A-Za-z]{3,9})[-/\s]?\d{2,4}')
+
+# header rows are recognized by containing one of these keywords
+_HEADER_KEYWORDS = ("items", "invoice", "amount")
+
 def detect_header_row(raw_df):
-    # iterates through rows until a row with one of the keywords is found    
-    expected_keywords = {"items", "invoice", "amount"}
-    for i, row in raw_df.iterrows():
-        row_values = [str(cell).lower() for cell in row if pd.notna(cell)]
-        for cell in row_values:
-            for keyword in expected_keywords:
-                if keyword in cell:
-                    return i
+    # returns the index of the first row containing one of the keywords
+    values = raw_df.to_numpy()
+    # scan in np.char blocks instead of iterrows(): each block runs in C,
+    # and stopping at the first hit avoids stringifying the whole sheet
+    # (the header is typically within the first few rows)
+    block_size = 64
+    for start in range(0, len(values), block_size):
+        cells = np.char.lower(values[start:start + block_size].astype(str))
+        hits = np.zeros(cells.shape, dtype=bool)
+        for keyword in _HEADER_KEYWORDS:
+            hits |= np.char.find(cells, keyword) >= 0
+        row_hits = hits.any(axis=1)
+        if row_hits.any():
+            return start + int(np.argmax(row_hits))
     return None
 
+def _parse_month_labels(columns):
+    labels = pd.Series(list(columns))
+    is_str = labels.map(lambda col: isinstance(col, str))
+
+    # handle case where pd does not auto parse as datetime (e.g. for CSV files)
+    str_labels = labels[is_str].astype(str).str.strip()
+    cleaned = str_labels.str.replace(_MONTH_SEP_RE, '-', regex=True)
+    # handle compact formats like 'May2024' or 'May24'
+    cleaned = cleaned.str.replace(_COMPACT_MONTH_RE, r'\1-\2', regex=True)
+    # full formats like '01-May-2024' or '01-05-24' are parsed as-is,
+    # month-only formats get a day prepended
+    full_date = str_labels.str.fullmatch(_FULL_DATE_RE)
+
+    # one vectorized datetime parse for all labels; anything that is not a
+    # month comes back as NaT instead of raising per column
+    parsed = pd.Series(pd.NaT, index=labels.index, dtype='datetime64[ns]')
+    parsed[is_str] = pd.to_datetime(str_labels.where(full_date, "01-" + cleaned),
+                                    dayfirst=True, format='mixed', errors='coerce')
+    # columns already in datetime type are parsed normally
+    parsed[~is_str] = pd.to_datetime(labels[~is_str], errors='coerce')
+    return parsed
+
 def parse_month_cols(df):
-    def is_month_column(col, idx):
-        try:
-            # handle case where pd does not auto parse as datetime (e.g. for CSV files)
-            if isinstance(col, str):
-                clean_col = col.replace(" ", "-").replace("/", "-")
-                # handle compact formats like 'May2024' or 'May24'
-                compact_match = re.fullmatch(r'([A-Za-z]{3,9})(\d{2,4})', clean_col)
-                if compact_match:
-                    month_part = compact_match.group(1)
-                    year_part = compact_match.group(2)
-                    clean_col = f"{month_part}-{year_part}"
-                # handle full formats like '01-May-2024' or '01-05-24'
-                full_date_match = re.fullmatch(r'\d{1,2}[-/\s]?(?:\d{1,2}|[A-Za-z]{3,9})[-/\s]?\d{2,4}', col.strip())                
-                if full_date_match:
-                    dt = pd.to_datetime(col.strip(), dayfirst=True)
-                else:
-                    dt = pd.to_datetime("01-" + clean_col, dayfirst=True)
-            else:
-                # if it is already in datetime type, then parse normally
-                dt = pd.to_datetime(col, dayfirst=True)
-            # normalize every month column to first of the month 
-            # -> for later comparison with user input
-            normalized = datetime.datetime(dt.year, dt.month, 1)
-            df.columns.values[idx] = normalized
-            return True
-        except Exception:
-            return False
+    parsed = _parse_month_labels(df.columns)
 
     # if there are no recognized months, throw error
-    month_indices = [i for i, col in enumerate(df.columns) if is_month_column(col, i)]
-    if not month_indices:
+    month_mask = parsed.notna().to_numpy()
+    if not month_mask.any():
         raise ValueError("No month-formatted columns found in header.")
-    
-    return month_indices[0], month_indices[-1]
+
+    # normalize every month column to first of the month
+    # -> for later comparison with user input
+    normalized = parsed.dt.to_period('M').dt.to_timestamp()
+    df.columns = [norm if is_month else col
+                  for norm, is_month, col in zip(normalized, month_mask, df.columns)]
+
+    month_indices = np.flatnonzero(month_mask)
+    return int(month_indices[0]), int(month_indices[-1])
+
+def _needed_columns(labels):
+    # downstream only uses Items, Invoice number and the month columns;
+    # everything else (invoice amounts, balance, notes, ...) can be dropped
+    labels = pd.Index(labels)
+    return _parse_month_labels(labels).notna().to_numpy() \
+        | labels.isin(["Items", "Invoice number"])
+
+def _detect_header_streaming(file_path):
+    # stream rows from the workbook one at a time and stop at the header,
+    # instead of parsing the whole sheet just to locate it; read-only mode
+    # keeps openpyxl from building the full worksheet in memory
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for i, row in enumerate(workbook.active.iter_rows(values_only=True)):
+            cells = [str(cell).lower() for cell in row if cell is not None]
+            if any(keyword in cell for cell in cells for keyword in _HEADER_KEYWORDS):
+                return i, list(row)
+        return None, None
+    finally:
+        workbook.close()
 
 def read_excel_file(file_path: str, use_xls=False):
     try:
-        # for older file format (xls) we use xlrd, otherwise default to openpyxl
-        engine = "xlrd" if use_xls else None
-        raw_df = pd.read_excel(file_path, header=None, dtype=str, engine=engine)
-        # detect the header row of table
-        header_row = detect_header_row(raw_df)
-        if header_row is None:
-            print("Error: Could not detect header row.")
-            return
-
-        # load dataframe with the table following the detected header
-        df = pd.read_excel(file_path, header=header_row, engine=None)
+        if use_xls:
+            # xlrd parses the whole .xls workbook on open, so there is nothing
+            # to gain from streaming: read once and slice the table in memory
+            try:
+                # calamine is much faster than xlrd, but optional
+                # (needs python-calamine installed)
+                raw_df = pd.read_excel(file_path, header=None, engine="calamine")
+            except ImportError:
+                raw_df = pd.read_excel(file_path, header=None, engine="xlrd")
+            header_row = detect_header_row(raw_df)
+            if header_row is None:
+                print("Error: Could not detect header row.")
+                return
+            df = raw_df.iloc[header_row + 1:].copy()
+            df.columns = raw_df.iloc[header_row].tolist()
+            df = df.loc[:, _needed_columns(df.columns)]
+            # slicing leaves object dtypes; recover the numeric columns
+            df = df.infer_objects()
+            # columns that are empty under the header keep the datetime dtype
+            # inferred from their header cell; cast them to float NaN columns,
+            # as a header-aware read would produce
+            all_nan_cols = df.columns[df.isna().all()]
+            df[all_nan_cols] = np.nan
+        else:
+            # locate the header from a cheap streamed scan, then parse the
+            # file once with the header and only the columns downstream uses
+            header_row, header_labels = _detect_header_streaming(file_path)
+            if header_row is None:
+                print("Error: Could not detect header row.")
+                return
+            usecols = np.flatnonzero(_needed_columns(header_labels))
+            try:
+                # calamine is much faster than openpyxl, but optional
+                # (needs python-calamine installed)
+                df = pd.read_excel(file_path, header=header_row,
+                                   usecols=usecols, engine="calamine")
+            except ImportError:
+                df = pd.read_excel(file_path, header=header_row, usecols=usecols)
 
         # clean up (drop fully empty rows, reset index)
         df.dropna(how='all', inplace=True)
-        # also drops rows where Items=NaN, e.g. Balance row at the end 
+        # also drops rows where Items=NaN, e.g. Balance row at the end
         df.dropna(subset=["Items"], inplace=True)
         df.reset_index(drop=True, inplace=True)
         return df
@@ -94,7 +160,11 @@ def main():
     # read the raw file (no header, all as strings)
     file_type = file_path.split(".")[-1]
     if file_type == "csv":
-        df = pd.read_csv(file_path)
+        try:
+            # pyarrow parses CSV multithreaded; optional dependency
+            df = pd.read_csv(file_path, engine="pyarrow")
+        except ImportError:
+            df = pd.read_csv(file_path)
         print("CSV file loaded successfully:")
     elif file_type == "xlsx": 
         df = read_excel_file(file_path)
@@ -106,6 +176,10 @@ def main():
         print(f"Invalid input file type:   {file_type}.\nPlease provide a .xls, .xlsx or .csv file.")
         return
     
+    # vendors repeat across rows; categorical dtype stores each unique name
+    # once and makes string ops on the column run per category, not per row
+    df["Items"] = df["Items"].astype("category")
+
     # auto detect the start/end index of the months columns
     start_idx, end_idx = parse_month_cols(df)
     
@@ -117,50 +191,65 @@ def main():
         except Exception:
             print(f"Sorry, {target} is not a valid month. Please use format MMM-YY, MMM-YYYY or MMMYY, MMMYYYY.")
             continue
-        if target_datetime in df.columns:
+        try:
+            # one hash lookup for both the membership test and the column
+            # position; the column itself is fetched positionally below
+            target_pos = df.columns.get_loc(target_datetime)
             break
-        else:
+        except KeyError:
             print(f"Sorry, the input document only has amortizations from {df.columns[start_idx].strftime('%b %y')} to {df.columns[end_idx].strftime('%b %y')}.\nPlease enter a month within that range.")
     
     
-    # only retrieve rows for the target month's column where the amortization 
-    # is non-zero and not NaN (i.e. only the amortizations that apply to this month)
-    filtered = df[df[target_datetime].notna() & (df[target_datetime] != 0)]
+    # only retrieve rows for the target month's column where the amortization
+    # is non-zero and not NaN (i.e. only the amortizations that apply to this
+    # month); mask on the raw array so the column is read and scanned once
+    target_col = df.iloc[:, target_pos].to_numpy()
+    filtered = df.iloc[(target_col != 0) & ~pd.isna(target_col)]
     
     # prompt user once for Prepayments Account code
     prepay_ledger_code = input("Please enter your Prepayments Ledger Code:\n").upper()
     
     # Calculate date for entries (end of month)
-    year = target_datetime.year
-    month = target_datetime.month
-    last_day = calendar.monthrange(year, month)[1]
-    last_day_of_month = datetime.datetime(year, month, last_day)
-    date = last_day_of_month.strftime('%d/%m/%Y')  # e.g., '31 May 24'
+    date = (target_datetime + pd.offsets.MonthEnd(0)).strftime('%d/%m/%Y')  # e.g., '31/05/2024'
     
-    rows = []
-    for idx, val in zip(filtered.index, filtered[target_datetime]):
-        # retrieve details from dataframe
-        item = "Prepayment amortization for " + df.at[idx, "Items"].title()
-        reference = int(df.at[idx, "Invoice number"])
-        amount = abs(round(val, 2))
-        # prompt user for each item's Expense ledger code
-        exp_ledger_code = input(f"Please enter the expense ledger code for\t{df.at[idx, 'Items'].title()}:\n").upper()
-        # Add Debit entry (on Expense Account) and Credit entry (on Prepayments Account) 
-        rows.append({"Date": date, "Description": item, "Reference": reference, "Account": exp_ledger_code, "Amount": amount})
-        rows.append({"Date": date, "Description": item, "Reference": reference, "Account": prepay_ledger_code, "Amount": -amount})
+    # retrieve details from dataframe as whole columns instead of per-row .at[] lookups
+    items = filtered["Items"].str.title()
+    references = filtered["Invoice number"].astype(int)
+    amounts = filtered[target_datetime].round(2).abs()
+
+    # prompt user for each unique item's Expense ledger code, and map the
+    # answers back onto the rows: the same vendor always gets the same code,
+    # so there is no point asking once per row
+    codes = {item: input(f"Please enter the expense ledger code for\t{item}:\n").upper()
+             for item in items.unique()}
+    exp_ledger_codes = items.map(codes)
+
+    descriptions = "Prepayment amortization for " + items
 
     # check or create the outputs directory
     output_dir = os.path.join(os.path.dirname(__file__), "outputs")
     os.makedirs(output_dir, exist_ok=True)
 
-    # calculate the next output index to avoid overwriting past results
-    existing_files = [f for f in os.listdir(output_dir) if f.endswith(".csv") and f[:-4].isdigit()]
-    existing_indices = sorted([int(f[:-4]) for f in existing_files])
-    out_idx = existing_indices[-1] + 1 if existing_indices else 0
+    # calculate the next output index to avoid overwriting past results;
+    # scandir streams directory entries instead of building a name list
+    max_idx = -1
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.endswith(".csv") and name[:-4].isdigit():
+                max_idx = max(max_idx, int(name[:-4]))
+    out_idx = max_idx + 1
 
-    # write to file
-    output_df = pd.DataFrame(rows)
-    output_df.to_csv(f"{output_dir}/{out_idx}.csv", index=False)
+    # stream the entries straight to file from the column arrays instead of
+    # assembling an intermediate DataFrame just for to_csv
+    with open(f"{output_dir}/{out_idx}.csv", "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["Date", "Description", "Reference", "Account", "Amount"])
+        for description, reference, account, amount in zip(descriptions, references,
+                                                           exp_ledger_codes, amounts):
+            # Debit entry (on Expense Account) and Credit entry (on Prepayments Account)
+            writer.writerow([date, description, reference, account, amount])
+            writer.writerow([date, description, reference, prepay_ledger_code, -amount])
     print(f"Entries written to {output_dir}/{out_idx}.csv")
 
 